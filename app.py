@@ -1,6 +1,12 @@
+import glob
+import os
+
 import streamlit as st
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as pa_csv
 import plotly.express as px
 import plotly.graph_objects as go
 import matplotlib.pyplot as plt
@@ -14,43 +20,249 @@ st.title("🚢 Nautilus Maritime Incidents – Advanced Interactive Dashboard")
 # -------------------------------
 # Load Data
 # -------------------------------
+DATA_PATH = "maritime_incidentsrr.csv"
+CACHE_VERSION = 8  # bump whenever load_data changes the cached columns or dtypes
+CACHE_PATH = f"maritime_incidentsrr.v{CACHE_VERSION}.parquet"
+CACHE_GLOB = "maritime_incidentsrr.v*.parquet"
+# Only the columns the dashboard reads, parsed straight into compact Arrow types
+LABEL_TYPE = pa.dictionary(pa.int32(), pa.string())  # becomes a pandas category
+COLUMN_TYPES = {
+    "Date": pa.string(),
+    "Country": LABEL_TYPE, "Vessel_Type": LABEL_TYPE, "Incident_Type": LABEL_TYPE, "Cargo_Loss": LABEL_TYPE,
+    "Casualties": pa.int32(), "Latitude": pa.float32(), "Longitude": pa.float32(),
+}
+
 @st.cache_data
 def load_data():
-    df = pd.read_csv("maritime_incidentsrr.csv")
-    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-    df["Year"] = df["Date"].dt.year
-    df["Month"] = df["Date"].dt.month
-    df["Day"] = df["Date"].dt.day
-    df["Cargo_Loss_Flag"] = df["Cargo_Loss"].map({"Yes": 1, "No": 0})
+    # Reuse the parquet sidecar unless the CSV has changed since it was written
+    if os.path.exists(CACHE_PATH) and os.path.getmtime(CACHE_PATH) >= os.path.getmtime(DATA_PATH):
+        return pd.read_parquet(CACHE_PATH)
+
+    # pyarrow parses the CSV multi-threaded; blank/"NA" labels become null as with pd.read_csv,
+    # and unparseable dates become null like errors="coerce"
+    table = pa_csv.read_csv(DATA_PATH, convert_options=pa_csv.ConvertOptions(
+        include_columns=list(COLUMN_TYPES), column_types=COLUMN_TYPES, strings_can_be_null=True))
+    dates = pc.strptime(table["Date"], format="%d-%m-%Y", unit="ns", error_is_null=True)
+    table = table.set_column(table.schema.get_field_index("Date"), "Date", dates)
+    df = table.to_pandas(types_mapper={pa.int32(): pd.Int32Dtype()}.get)
+    # Nullable small ints: undated rows stay in the KPIs, Sankey and radar with NA date parts
+    df["Year"] = df["Date"].dt.year.astype("Int16")
+    df["Month"] = df["Date"].dt.month.astype("Int8")
+    df["Day"] = df["Date"].dt.day.astype("Int8")
+    # Integer month bucket (Year*12 + Month-1) used by the month x year aggregates
+    df["YearMonth"] = df["Year"].astype("Int32") * 12 + df["Month"] - 1
+    # Per-category lookup indexed by the codes; the trailing False covers code -1 (missing) and
+    # a file with no "Yes" rows, so the flag is always 0/1 without a per-row dict map
+    cargo_loss = df["Cargo_Loss"].cat
+    is_yes = np.append(cargo_loss.categories == "Yes", False)
+    df["Cargo_Loss_Flag"] = is_yes[cargo_loss.codes.to_numpy()].astype(np.int8)
+    # Arrow-backed numeric/date columns (categories are left as-is) so reductions run on Arrow compute
+    df = df.convert_dtypes(dtype_backend="pyarrow")
+    # The sidecar is only an optimisation: if the directory isn't writable, serve the parsed frame anyway
+    try:
+        df.to_parquet(CACHE_PATH + ".tmp", compression="zstd")
+        os.replace(CACHE_PATH + ".tmp", CACHE_PATH)  # never leave a half-written sidecar to be read back
+        for stale in glob.glob(CACHE_GLOB):
+            if stale != CACHE_PATH:
+                os.remove(stale)
+    except OSError:
+        pass
     return df
 
 data = load_data()
 
+# -------------------------------
+# Filtering & Cached Aggregates
+# -------------------------------
+FILTER_COLUMNS = ("Year", "Country", "Vessel_Type", "Incident_Type")
+CACHE_MAX_ENTRIES = 64  # filter selections kept per cache; the filter space is combinatorial
+
+def apply_filters(df, filter_key):
+    # Combine all active filters into one mask so the frame is sliced only once
+    masks = [df[col].isin(sel).to_numpy() for col, sel in zip(FILTER_COLUMNS, filter_key) if sel]
+    return df.iloc[np.logical_and.reduce(masks)] if masks else df
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def aggregates(filter_key):
+    # Small summary frames shared by the KPIs and tabs, computed once per filter selection
+    filtered = apply_filters(load_data(), filter_key)
+    summary = {"kpis": (
+        len(filtered),
+        int(filtered["Casualties"].fillna(0).sum()),
+        int(filtered["Cargo_Loss_Flag"].sum()),
+        filtered["Country"].nunique(),
+    ), "dated_incidents": int(filtered["YearMonth"].notna().sum())}
+    if filtered.empty:
+        return summary
+
+    # Count dated incidents per YearMonth bucket in one bincount pass
+    bucket = filtered["YearMonth"].dropna().to_numpy()
+    if bucket.size:
+        first_year, last_year = bucket.min() // 12, bucket.max() // 12
+        counts = np.bincount(bucket - first_year * 12, minlength=(last_year - first_year + 1) * 12)
+        pivot = pd.DataFrame(counts.reshape(-1, 12).T, index=pd.RangeIndex(1, 13, name="Month"),
+                             columns=pd.RangeIndex(first_year, last_year + 1, name="Year"))
+        summary["month_year_pivot"] = pivot.loc[pivot.any(axis=1), pivot.any(axis=0)]
+
+    # Sankey nodes are the incident types followed by the vessel types, so link ends are plain category codes
+    sankey_counts = filtered.groupby(["Incident_Type", "Vessel_Type"], observed=True, sort=False).size().reset_index(name="count")
+    incident = sankey_counts["Incident_Type"].cat.remove_unused_categories()
+    vessel = sankey_counts["Vessel_Type"].cat.remove_unused_categories()
+    summary["sankey_labels"] = list(incident.cat.categories) + list(vessel.cat.categories)
+    summary["sankey_links"] = pd.DataFrame({
+        # Codes are int8 for small categories; widen before offsetting so targets can't wrap
+        "source": incident.cat.codes.astype(np.int32),
+        "target": vessel.cat.codes.astype(np.int32) + len(incident.cat.categories),
+        "count": sankey_counts["count"],
+    })
+
+    # One pass over the rows per country; the top-5 cut runs on the small aggregate
+    country_totals = filtered.groupby("Country", observed=True, sort=False).agg(
+        Casualties=("Casualties", "sum"),
+        Cargo_Loss_Flag=("Cargo_Loss_Flag", "sum"),
+        Incident_Type=("Incident_Type", "count"),
+    )
+    # Ties on incident count go to the alphabetically first country, so the top 5 is deterministic
+    ranked = country_totals.reset_index().astype({"Country": str})
+    summary["radar_counts"] = (ranked.sort_values(["Incident_Type", "Country"], ascending=[False, True])
+                               .head(5).reset_index(drop=True))
+    return summary
+
+# -------------------------------
+# Cached Figures
+# -------------------------------
+# Built figures are shared across reruns and sessions per filter selection, so revisiting a
+# tab skips Plotly's figure construction and validation. Callers must not mutate them.
+FIGURE_CACHE_MAX_ENTRIES = 16  # figures per builder; a timeline figure can reach ~1 MB
+FRAME_SAMPLE_LIMIT = 3000  # max points per animation frame
+TIMELINE_SIZE_MAX = 30  # marker diameter (px) for the largest casualty count
+
+@st.cache_resource(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_heatmap_fig(filter_key):
+    return px.imshow(aggregates(filter_key)["month_year_pivot"], text_auto=True, aspect="auto",
+                     color_continuous_scale="RdYlBu_r", labels=dict(x="Year", y="Month", color="Incidents"))
+
+@st.cache_resource(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_timeline_fig(filter_key):
+    # Returns the figure and the number of points it shows
+    filtered = apply_filters(load_data(), filter_key)
+    filtered = filtered[filtered["Year"].notna().to_numpy()]  # undated rows have no frame
+
+    # Cap the points drawn per animation frame with a reproducible random subset per year,
+    # stratified by incident type so rare types keep at least one point
+    timeline_data = filtered
+    if filtered["Year"].value_counts().max() > FRAME_SAMPLE_LIMIT:
+        shuffled = filtered.sample(frac=1, random_state=0)
+        strata = shuffled.groupby(["Year", "Incident_Type"], observed=True, sort=False)
+        by_year = shuffled.groupby("Year", sort=False)
+        strata_size = strata["Year"].transform("size").to_numpy(np.int64)
+        year_size = by_year["Year"].transform("size").to_numpy(np.int64)
+        year_types = by_year["Incident_Type"].transform("nunique").to_numpy(np.int64)
+        # Over-limit years: one point per type comes out of the budget first, the rest is shared
+        # in proportion to type size, so a frame never exceeds FRAME_SAMPLE_LIMIT
+        spare = (strata_size - 1) * (FRAME_SAMPLE_LIMIT - year_types) // np.maximum(year_size - year_types, 1)
+        quota = np.where(year_size > FRAME_SAMPLE_LIMIT, 1 + spare, strata_size)
+        timeline_data = shuffled[strata.cumcount().to_numpy() < quota].sort_index()
+
+    # One WebGL trace per incident type in every frame, so the legend and colours stay fixed across years
+    incident_types = timeline_data["Incident_Type"].cat.remove_unused_categories().cat.categories
+    palette = px.colors.qualitative.Plotly
+    sizeref = 2.0 * max(timeline_data["Casualties"].fillna(0).max(), 1) / TIMELINE_SIZE_MAX ** 2
+    groups = dict(list(timeline_data.groupby(["Year", "Incident_Type"], observed=True, sort=False)))
+    no_rows = timeline_data.iloc[:0]
+    frames = []
+    for year in sorted(timeline_data["Year"].unique()):
+        traces = []
+        for i, incident in enumerate(incident_types):
+            rows = groups.get((year, incident), no_rows)
+            traces.append(go.Scattergl(
+                x=rows["Longitude"].to_numpy(dtype=float, na_value=np.nan),
+                y=rows["Latitude"].to_numpy(dtype=float, na_value=np.nan),
+                mode="markers", name=incident, hovertext=rows["Country"].to_numpy(),
+                hovertemplate="<b>%{hovertext}</b><br>Longitude=%{x:.3f}<br>Latitude=%{y:.3f}<br>Casualties=%{marker.size}",
+                marker=dict(size=rows["Casualties"].to_numpy(dtype=float, na_value=0), sizemode="area",
+                            sizeref=sizeref, color=palette[i % len(palette)])
+            ))
+        frames.append(go.Frame(data=traces, name=str(year)))
+
+    redraw = {"frame": {"duration": 0, "redraw": True}, "mode": "immediate"}
+    fig = go.Figure(data=frames[0].data, frames=frames, layout=go.Layout(
+        title="Incidents Progression Over Years",
+        xaxis=dict(title="Longitude", range=[-180, 180]),
+        yaxis=dict(title="Latitude", range=[-90, 90]),
+        legend_title_text="Incident_Type",
+        # Only hit-test points under the cursor instead of searching the whole frame
+        hovermode="closest", hoverdistance=1,
+        updatemenus=[dict(type="buttons", direction="left", x=0.1, y=0, xanchor="right", yanchor="top",
+                          pad=dict(r=10, t=70), showactive=False, buttons=[
+            dict(label="▶", method="animate",
+                 args=[None, {"frame": {"duration": 500, "redraw": True}, "fromcurrent": True}]),
+            dict(label="◼", method="animate", args=[[None], redraw]),
+        ])],
+        sliders=[dict(active=0, x=0.1, y=0, len=0.9, pad=dict(b=10, t=60), currentvalue=dict(prefix="Year="),
+                      steps=[dict(label=f.name, method="animate", args=[[f.name], redraw]) for f in frames])]
+    ))
+    return fig, len(timeline_data)
+
+@st.cache_resource(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_sankey_fig(filter_key):
+    summary = aggregates(filter_key)
+    links = summary["sankey_links"]
+    return go.Figure(data=[go.Sankey(
+        node=dict(
+            pad=20, thickness=20,
+            line=dict(color="black", width=0.5),
+            label=summary["sankey_labels"]
+        ),
+        link=dict(
+            source=links["source"],
+            target=links["target"],
+            value=links["count"]
+        )
+    )])
+
+@st.cache_resource(max_entries=FIGURE_CACHE_MAX_ENTRIES)
+def build_radar_fig(filter_key):
+    radar_data = aggregates(filter_key)["radar_counts"]
+    categories = ["Casualties", "Cargo_Loss_Flag", "Incident_Type"]
+    fig = go.Figure()
+    fig.add_traces([go.Scatterpolar(
+        r=radar_data.loc[i, categories].to_numpy(),
+        theta=categories,
+        fill='toself',
+        name=radar_data.at[i, "Country"]
+    ) for i in radar_data.index])
+    fig.update_layout(polar=dict(radialaxis=dict(visible=True)), showlegend=True)
+    return fig
+
 # -------------------------------
 # Sidebar Filters
 # -------------------------------
 st.sidebar.header("🔍 Filters")
-years = st.sidebar.multiselect("Select Year(s):", sorted(data["Year"].dropna().unique()))
-countries = st.sidebar.multiselect("Select Country:", sorted(data["Country"].dropna().unique()))
-vessels = st.sidebar.multiselect("Select Vessel Type:", sorted(data["Vessel_Type"].dropna().unique()))
-incidents = st.sidebar.multiselect("Select Incident Type:", sorted(data["Incident_Type"].dropna().unique()))
+# Selections only take effect on "Apply", so picking several options triggers a single rerun
+with st.sidebar.form("filters"):
+    years = st.multiselect("Select Year(s):", sorted(data["Year"].dropna().unique()))
+    countries = st.multiselect("Select Country:", sorted(data["Country"].dropna().unique()))
+    vessels = st.multiselect("Select Vessel Type:", sorted(data["Vessel_Type"].dropna().unique()))
+    incidents = st.multiselect("Select Incident Type:", sorted(data["Incident_Type"].dropna().unique()))
+    st.form_submit_button("Apply filters")
 
-filtered = data.copy()
-if years: filtered = filtered[filtered["Year"].isin(years)]
-if countries: filtered = filtered[filtered["Country"].isin(countries)]
-if vessels: filtered = filtered[filtered["Vessel_Type"].isin(vessels)]
-if incidents: filtered = filtered[filtered["Incident_Type"].isin(incidents)]
+# Only the cached summaries are needed here; the row-level slice is built inside the cached builders
+filter_key = tuple(tuple(sorted(sel)) for sel in (years, countries, vessels, incidents))
+summary = aggregates(filter_key)
+total_incidents, total_casualties, cargo_loss_events, countries_involved = summary["kpis"]
+dated_incidents = summary["dated_incidents"]
 
-st.sidebar.success(f"📊 Showing {len(filtered)} records")
+st.sidebar.success(f"📊 Showing {total_incidents} records")
 
 # -------------------------------
 # KPI Metrics
 # -------------------------------
 c1, c2, c3, c4 = st.columns(4)
-c1.metric("Total Incidents", len(filtered))
-c2.metric("Total Casualties", int(filtered["Casualties"].fillna(0).sum()))
-c3.metric("Cargo Loss Events", int(filtered["Cargo_Loss_Flag"].fillna(0).sum()))
-c4.metric("Countries Involved", filtered["Country"].nunique())
+c1.metric("Total Incidents", total_incidents)
+c2.metric("Total Casualties", total_casualties)
+c3.metric("Cargo Loss Events", cargo_loss_events)
+c4.metric("Countries Involved", countries_involved)
 
 # -------------------------------
 # Tabs for Advanced Visuals
@@ -62,27 +274,18 @@ tab1, tab2, tab3, tab4 = st.tabs([
 # 1. Calendar Heatmap
 with tab1:
     st.subheader("📅 Incidents by Month & Year")
-    if not filtered.empty:
-        pivot = filtered.pivot_table(index="Month", columns="Year", values="Incident_Type", aggfunc="count", fill_value=0)
-        fig = px.imshow(pivot, text_auto=True, aspect="auto", color_continuous_scale="RdYlBu_r",
-                        labels=dict(x="Year", y="Month", color="Incidents"))
-        st.plotly_chart(fig, use_container_width=True)
+    if dated_incidents:
+        st.plotly_chart(build_heatmap_fig(filter_key), use_container_width=True)
     else:
         st.warning("No data for selected filters.")
 
 # 2. Animated Timeline
 with tab2:
     st.subheader("🎥 Animated Incidents Over Time")
-    if not filtered.empty:
-        fig = px.scatter(
-            filtered,
-            x="Longitude", y="Latitude",
-            animation_frame="Year", animation_group="Incident_Type",
-            size="Casualties", color="Incident_Type",
-            hover_name="Country",
-            title="Incidents Progression Over Years",
-            size_max=30, projection="natural earth"
-        )
+    if dated_incidents:
+        fig, shown = build_timeline_fig(filter_key)
+        if shown < dated_incidents:
+            st.caption(f"Showing {shown} of {dated_incidents} points (subsampled)")
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.warning("No data for selected filters.")
@@ -90,49 +293,16 @@ with tab2:
 # 3. Sankey Diagram
 with tab3:
     st.subheader("🔗 Incident Types vs Vessel Types")
-    if not filtered.empty:
-        source_labels = list(filtered["Incident_Type"].unique()) + list(filtered["Vessel_Type"].unique())
-        source_dict = {k: v for v, k in enumerate(source_labels)}
-        
-        sankey_data = filtered.groupby(["Incident_Type", "Vessel_Type"]).size().reset_index(name="count")
-        fig = go.Figure(data=[go.Sankey(
-            node=dict(
-                pad=20, thickness=20,
-                line=dict(color="black", width=0.5),
-                label=source_labels
-            ),
-            link=dict(
-                source=sankey_data["Incident_Type"].map(source_dict),
-                target=sankey_data["Vessel_Type"].map(source_dict),
-                value=sankey_data["count"]
-            )
-        )])
-        st.plotly_chart(fig, use_container_width=True)
+    if total_incidents:
+        st.plotly_chart(build_sankey_fig(filter_key), use_container_width=True)
     else:
         st.warning("No data for selected filters.")
 
 # 4. Radar Chart
 with tab4:
     st.subheader("🕸 Country Comparison (Radar Chart)")
-    if not filtered.empty:
-        top_countries = filtered["Country"].value_counts().nlargest(5).index
-        radar_data = filtered[filtered["Country"].isin(top_countries)].groupby("Country").agg({
-            "Casualties": "sum",
-            "Cargo_Loss_Flag": "sum",
-            "Incident_Type": "count"
-        }).reset_index()
-        
-        categories = ["Casualties", "Cargo_Loss_Flag", "Incident_Type"]
-        fig = go.Figure()
-        for _, row in radar_data.iterrows():
-            fig.add_trace(go.Scatterpolar(
-                r=row[categories].values,
-                theta=categories,
-                fill='toself',
-                name=row["Country"]
-            ))
-        fig.update_layout(polar=dict(radialaxis=dict(visible=True)), showlegend=True)
-        st.plotly_chart(fig, use_container_width=True)
+    if total_incidents:
+        st.plotly_chart(build_radar_fig(filter_key), use_container_width=True)
     else:
         st.warning("No data for selected filters.")
 